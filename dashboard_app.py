@@ -5,20 +5,29 @@ Deployable on Vercel
 """
 
 import pandas as pd
+import numpy as np
+import ciso8601
 import plotly.express as px
 import plotly.graph_objects as go
 from plotly.subplots import make_subplots
-from dash import Dash, dcc, html, Input, Output, State, callback
+from dash import Dash, dcc, html, dash_table, Input, Output, State, callback
 import dash
 import dash_bootstrap_components as dbc
 import gspread
+from gspread.urls import SPREADSHEET_VALUES_BATCH_URL
 from google.oauth2.service_account import Credentials
 from datetime import datetime, timedelta
 import io
 import base64
 import time
 import os
+import tempfile
 import json
+import orjson
+import pyarrow.parquet as pq
+from itertools import zip_longest
+from functools import lru_cache
+from bisect import bisect_right
 
 # ========================================================================================================
 # CONFIGURATION
@@ -26,12 +35,46 @@ import json
 
 SPREADSHEET_ID = "14XMNROBL6PT_GYq43AVJb9e_IowOZp_ZP_IpCwmQCgs"
 WORKSHEET_NAMES = ["Foundation Data", "CUET UG Data"]  # List of all worksheets to load
+# Row holding the column headers in each worksheet (rows above it are report metadata)
+WORKSHEET_HEADER_ROWS = {"Foundation Data": 6, "CUET UG Data": 6}
+WORKSHEET_RANGES = [f"'{name}'!A{WORKSHEET_HEADER_ROWS[name]}:ZZ" for name in WORKSHEET_NAMES]
+# Column names that identify the header row
+HEADER_KEYS = frozenset(('batchid', '_id', 'name', 'converteddate'))
+# Raw cell values: numbers stay numbers and dates arrive as serial day counts
+SHEETS_VALUE_PARAMS = {'valueRenderOption': 'UNFORMATTED_VALUE', 'dateTimeRenderOption': 'SERIAL_NUMBER'}
+SHEETS_EPOCH = pd.Timestamp('1899-12-30')  # Day 0 of Google Sheets serial dates
+
+# Back the 'string' dtype with Arrow, including columns read back from the Parquet cache
+pd.set_option('mode.string_storage', 'pyarrow')
+
+# Column groups used for memory optimization
+NUMERIC_COLUMNS = ['net_amount', 'coupondiscount', 'donationamount', 'ADD_ON_STORE']
+DATE_COLUMNS = ['converteddate', 'startdate']  # Arrive as serial day numbers, parsed by parse_sheet_dates
+CATEGORY_COLUMNS = ['name', 'plan', 'Exam_2', 'order_type', 'batch_eligibility',
+                    'couponcode', 'couponid', 'leader_fin', 'type_2']
+# Every filter and chart dimension, so the charts can be drawn from the pre-aggregated cube
+CUBE_KEYS = ['name', 'Exam_2', 'plan', 'converteddate']
+# Batch summary export columns that get a grand total in the TOTAL row
+EXPORT_SUM_COLUMNS = ['Total Enrollments', 'Total Revenue (₹ Cr)', 'Primary Orders', 'Upgrade Orders']
+# Excel exports write cell text verbatim, skipping xlsxwriter's per-cell URL and formula sniffing
+EXCEL_WRITER_OPTIONS = {'options': {'strings_to_urls': False, 'strings_to_formulas': False}}
+EXCEL_SHEET_ROWS = 100_000  # Longer exports are split across sheets of this many rows
 SERVICE_ACCOUNT_FILE = "pw-service-22bdcc39f732.json"
+DEBUG = os.getenv('DASH_DEBUG') == '1'  # Verbose data-loading diagnostics
 
 # Global cache
 DATA_CACHE = None
 CACHE_TIMESTAMP = None
 CACHE_DURATION = 300  # 5 minutes
+DATA_VERSION = 0  # Bumped whenever new data is installed, retiring results memoized for older data
+DATA_MEMOS = []  # Memoized functions over DATA_CACHE (see data_memo), cleared on every data refresh
+FILTER_OPTIONS = {}  # Sorted dropdown values per filter column, rebuilt on every refresh
+FILTER_SEARCH_INDEX = {}  # Per column: (option dicts, lowercased values joined into one string, start offsets) for C-speed keystroke searches
+FILTER_CHOICES = {}  # Checklist option dicts for FILTER_OPTIONS, built once so blank searches reuse them
+DATA_CUBE = None  # Enrollment counts and revenue pre-aggregated per batch/exam/plan/date
+SHEETS_CLIENT = None  # Authorized gspread client, reused across refreshes
+# On-disk copy of the cleaned data so serverless cold starts skip the Sheets fetch
+CACHE_FILE = os.path.join(tempfile.gettempdir(), 'enrollment_cache.parquet')
 
 # ========================================================================================================
 # DATA LOADING FUNCTION (OPTIMIZED)
@@ -56,49 +99,563 @@ def get_google_credentials():
     
     raise Exception("No Google credentials found. Set GOOGLE_CREDENTIALS environment variable or provide service account file.")
 
+def _log(message):
+    """Print diagnostics only when DASH_DEBUG=1, keeping log shipping off the serverless cold path"""
+    if DEBUG:
+        print(message)
+
+def _log_data_profile(df):
+    """Print a summary of freshly loaded data (each line scans a full column, so debug only)"""
+    if 'converteddate' in df.columns:
+        print(f"  Date range: {df['converteddate'].min()} to {df['converteddate'].max()}")
+    if 'name' in df.columns:
+        print(f"  Unique batches: {df['name'].nunique()}")
+    if 'Exam_2' in df.columns:
+        print(f"  Unique exams: {df['Exam_2'].nunique()}")
+
+def _parse_iso_datetime(text):
+    """Parse one ISO-8601 string with ciso8601, returning None when it is not ISO formatted"""
+    try:
+        return ciso8601.parse_datetime_as_naive(text)
+    except (ValueError, TypeError):
+        return None
+
+def parse_text_dates(values):
+    """Parse text dates with the ciso8601 fast path, using pandas only for non-ISO formats"""
+    # Non-ISO text (e.g. '03/09/2025') needs pandas' flexible parser
+    if any(_parse_iso_datetime(value) is None for value in values.iloc[:100]):
+        return pd.to_datetime(values, errors='coerce')
+    
+    nat = np.datetime64('NaT')
+    parsed = np.fromiter((_parse_iso_datetime(value) or nat for value in values),
+                         dtype='datetime64[ns]', count=len(values))
+    return pd.Series(parsed, index=values.index)
+
+def parse_sheet_dates(values):
+    """Convert Google Sheets serial date numbers to datetimes, parsing any text dates as a fallback"""
+    serials = pd.to_numeric(values, errors='coerce')
+    dates = SHEETS_EPOCH + pd.to_timedelta(serials, unit='D')
+    
+    # Cells that hold text rather than a real date come back as strings
+    text_mask = serials.isna() & values.notna() & (values != '')
+    if text_mask.any():
+        dates[text_mask] = parse_text_dates(values[text_mask])
+    return dates
+
+def find_header_row(values):
+    """Index of the first row containing a known column name, only scanning on if the sheet layout moved"""
+    for i, row in enumerate(values):
+        if not HEADER_KEYS.isdisjoint(str(cell).strip().lower() for cell in row):
+            return i
+    return 0
+
+def build_sheet_frame(header, rows):
+    """Build a worksheet DataFrame column by column instead of from a list of row lists"""
+    # Transpose in C, padding the trailing empty cells the API leaves off each row
+    columns = list(zip_longest(*rows, fillvalue=''))
+    empty = ('',) * len(rows)
+    
+    # Clean column names and skip unnamed columns so labels stay unique across sheets
+    names = [(i, str(name).strip()) for i, name in enumerate(header)]
+    return pd.DataFrame({
+        name: _sheet_column(name, columns[i] if i < len(columns) else empty)
+        for i, name in names if name != ''
+    }, copy=False)
+
+def _cell_text(cell):
+    """Text of one unformatted cell, spelling booleans the way the Sheets UI shows them"""
+    if isinstance(cell, bool):
+        return 'TRUE' if cell else 'FALSE'
+    return str(cell)
+
+def _sheet_column(name, cells):
+    """Array for one sheet column, built straight into a Categorical for low-cardinality text columns"""
+    if name not in NUMERIC_COLUMNS and name not in DATE_COLUMNS:
+        # Unformatted values turn numeric-looking text (a batch named 2025, a numeric coupon code) into
+        # JSON numbers; keep text columns all-str so sorting, categories and Parquet see one type
+        cells = [cell if cell.__class__ is str else _cell_text(cell) for cell in cells]
+    values = np.asarray(cells, dtype=object)
+    if name in CATEGORY_COLUMNS and len(values) > 0:
+        # One factorize pass gives both the cardinality check and the category codes
+        codes, uniques = pd.factorize(values)
+        # Filter/chart keys are always categorical; they are matched and grouped on every callback
+        if name in CUBE_KEYS or len(uniques) / len(values) < 0.5:
+            return pd.Categorical.from_codes(codes, uniques)
+    return values
+
+def align_categories(frames):
+    """Give a column the same categories in every sheet so concat keeps it categorical"""
+    for col in frames[0].columns:
+        parts = [frame[col] for frame in frames]
+        if len(parts) > 1 and all(isinstance(part.dtype, pd.CategoricalDtype) for part in parts):
+            categories = parts[0].cat.categories.append([part.cat.categories for part in parts[1:]]).unique()
+            for frame, part in zip(frames, parts):
+                frame[col] = part.cat.set_categories(categories)
+    return frames
+
+def _smallest_numeric_dtype(values):
+    """Smallest dtype that holds every value of a float array without loss"""
+    if len(values) == 0 or not np.all(np.mod(values, 1) == 0):
+        return np.dtype('float32')
+    # Whole numbers fit an int/uint subtype picked from the min and max
+    return np.result_type(np.min_scalar_type(int(values.min())), np.min_scalar_type(int(values.max())))
+
+def shrink_dtypes(df):
+    """Optimize data types for memory with one astype over the numeric and text columns"""
+    numeric_cols = [col for col in NUMERIC_COLUMNS if col in df.columns]
+    numeric = df[numeric_cols].apply(pd.to_numeric, errors='coerce').fillna(0)
+    new_dtypes = {col: _smallest_numeric_dtype(numeric[col].to_numpy()) for col in numeric_cols}
+    
+    # Convert to category if column is a filter/chart key or has less than 50% unique values
+    for col in CATEGORY_COLUMNS:
+        if col in df.columns and df[col].dtype == 'object' and len(df) > 0:
+            if col in CUBE_KEYS or df[col].nunique() / len(df) < 0.5:
+                new_dtypes[col] = 'category'
+    
+    # Remaining text columns (IDs, coupon codes) use Arrow strings: one buffer instead of a Python object per cell
+    for col in df.columns:
+        if col not in new_dtypes and col not in numeric_cols and df[col].dtype == 'object':
+            new_dtypes[col] = 'string'
+    
+    return df.assign(**{col: numeric[col] for col in numeric_cols}).astype(new_dtypes)
+
+def freeze_frame(df):
+    """Mark the frame's numpy blocks read-only so the shared cached data can't be mutated in place"""
+    for block in df._mgr.blocks:
+        if isinstance(block.values, np.ndarray):
+            block.values.flags.writeable = False
+    return df
+
+def _observed_values(column):
+    """Distinct non-null values of a column, read off the integer codes for categoricals"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = np.unique(column.cat.codes.to_numpy())
+        return column.cat.categories.take(codes[codes >= 0])
+    return column.dropna().unique()
+
+def build_filter_options(df):
+    """Sorted, cleaned values for each filter dropdown, computed once per data refresh"""
+    options = {}
+    if 'name' in df.columns:
+        options['name'] = tuple(sorted(_observed_values(df['name'])))
+    if 'Exam_2' in df.columns:
+        options['Exam_2'] = tuple(sorted(_observed_values(df['Exam_2'])))
+    if 'plan' in df.columns:
+        # Filter out NaN, None, empty string, and 'None' string values
+        options['plan'] = tuple(p for p in sorted(_observed_values(df['plan']))
+                                if str(p).strip() != '' and str(p).strip().lower() != 'none')
+    return options
+
+def build_search_index(values):
+    """Lowercased values joined by newlines, plus the offset where each value starts"""
+    lowered = [str(value).lower() for value in values]
+    starts, offset = [], 0
+    for value in lowered:
+        starts.append(offset)
+        offset += len(value) + 1
+    return '\n'.join(lowered), starts
+
+def build_enrollment_cube(df):
+    """Pre-aggregate enrollments and revenue per batch/exam/plan/date so charts group a small cube"""
+    if 'converteddate' not in df.columns:
+        return None
+    keys = [col for col in CUBE_KEYS if col in df.columns]
+    aggregations = {'enrollments': ('converteddate', 'size')}
+    if 'net_amount' in df.columns:
+        aggregations['net_amount'] = ('net_amount', 'sum')
+    # Keep rows with blank keys so totals still match the row-level data
+    cube = df.groupby(keys, observed=True, dropna=False, sort=False).agg(**aggregations).reset_index()
+    return cube.sort_values('converteddate', kind='stable', ignore_index=True)
+
+def get_enrollment_cube(df):
+    """Cube for the given data, reusing the one built at load time when df is the cached frame"""
+    if df is DATA_CACHE and DATA_CUBE is not None:
+        return DATA_CUBE
+    return build_enrollment_cube(df)
+
+def _selection_mask(column, selected):
+    """Boolean mask of rows whose value is selected, comparing integer codes for categoricals"""
+    if isinstance(column.dtype, pd.CategoricalDtype):
+        codes = column.cat.categories.get_indexer(selected)
+        return np.isin(column.cat.codes.to_numpy(), codes[codes >= 0])
+    return column.isin(selected).to_numpy()
+
+def date_bounds(frame, start_date, end_date=None):
+    """(lo, hi) positions of the rows dated start_date..end_date (inclusive, open-ended without end_date)"""
+    # Sorted by date, so the range is a contiguous slice found by binary search
+    dates = frame['converteddate'].to_numpy()
+    lo = dates.searchsorted(pd.Timestamp(start_date).to_datetime64())
+    hi = len(dates) if end_date is None else dates.searchsorted(pd.Timestamp(end_date).to_datetime64(), side='right')
+    return int(lo), int(hi)
+
+def slice_dates(frame, start_date, end_date=None):
+    """Rows dated start_date..end_date (inclusive, open-ended without end_date) of a date-sorted frame"""
+    lo, hi = date_bounds(frame, start_date, end_date)
+    return frame.iloc[lo:hi]
+
+def last_7_days_start(end_date):
+    """Start of the 'last 7 days' window shown by the trend charts, cards and exports"""
+    return pd.Timestamp(end_date) - pd.Timedelta(days=7)
+
+def filter_positions(frame, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """Date slice bounds plus the int32 positions (within the slice) of rows matching the dropdown filters,
+    or None for the positions when no dropdown filter is active"""
+    lo, hi = date_bounds(frame, start_date, end_date) if 'converteddate' in frame.columns else (0, len(frame))
+    frame = frame.iloc[lo:hi]
+    
+    # Combine the dropdown filters into one mask
+    mask = None
+    for col, selected in (('name', batch_filter), ('Exam_2', exam_filter), ('plan', plan_filter)):
+        if selected and len(selected) > 0 and col in frame.columns:
+            col_mask = _selection_mask(frame[col], selected)
+            mask = col_mask if mask is None else mask & col_mask
+    positions = None if mask is None else mask.nonzero()[0].astype(np.int32)
+    return lo, hi, positions
+
+def take_rows(frame, lo, hi, positions):
+    """Rows picked out by filter_positions: a view for a date-only filter, one take otherwise"""
+    frame = frame.iloc[lo:hi]
+    return frame if positions is None else frame.iloc[positions]
+
+def filter_data(frame, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """Apply the dashboard's date and dropdown filters to the row-level data or the cube"""
+    return take_rows(frame, *filter_positions(frame, start_date, end_date, batch_filter, exam_filter, plan_filter))
+
+def data_memo(maxsize):
+    """lru_cache for results derived from DATA_CACHE, emptied by set_data_cache whenever new data is installed"""
+    def decorator(func):
+        memo = lru_cache(maxsize=maxsize)(func)
+        DATA_MEMOS.append(memo)
+        return memo
+    return decorator
+
+@data_memo(maxsize=16)
+def cached_filter_positions(data_version, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """filter_positions on the cached data, memoized so the dashboard and its exports share one mask pass"""
+    lo, hi, positions = filter_positions(DATA_CACHE, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    if positions is not None:
+        positions.flags.writeable = False
+    return lo, hi, positions
+
+def cached_filtered_data(data_version, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """Filtered rows of the cached data, rebuilt on demand from the memoized positions"""
+    # Only the positions are kept: memoized row copies would hold several times the data in memory
+    positions = cached_filter_positions(data_version, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    return freeze_frame(take_rows(DATA_CACHE, *positions))
+
+def get_filtered_rows(df, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """Filtered row-level data, served from the shared memo when df is the cached frame"""
+    if df is DATA_CACHE:
+        return cached_filtered_data(DATA_VERSION, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    return filter_data(df, start_date, end_date, batch_filter, exam_filter, plan_filter)
+
+def build_chart_totals(df, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """Card metrics plus per-date, per-batch and per-exam totals from the filtered cube"""
+    cube = get_enrollment_cube(df)
+    if cube is None:
+        return None
+    cube = filter_data(cube, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    
+    # One groupby per chart dimension, shared by every chart and export that uses it;
+    # the last-7-days window is one binary-searched slice feeding both trend charts and the card
+    value_cols = [col for col in ('enrollments', 'net_amount') if col in cube.columns]
+    last_7 = slice_dates(cube, last_7_days_start(end_date)).groupby('converteddate')[value_cols].sum().reset_index()
+    # Format dates without time
+    last_7['date_display'] = last_7['converteddate'].dt.strftime('%d %b %Y')
+    totals = {'summary': summarize_cube(cube, last_7), 'last_7': last_7}
+    if 'name' in cube.columns:
+        totals['by_name'] = cube.groupby('name', observed=True)['enrollments'].sum().sort_values(ascending=False)
+    if 'Exam_2' in cube.columns:
+        totals['by_exam'] = (cube.groupby('Exam_2', observed=True)[value_cols].sum()
+                             .sort_values('enrollments', ascending=False))
+    return totals
+
+@data_memo(maxsize=16)
+def cached_chart_totals(data_version, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """build_chart_totals on the cached data, memoized so chart exports reuse the dashboard's aggregates"""
+    return build_chart_totals(DATA_CACHE, start_date, end_date, batch_filter, exam_filter, plan_filter)
+
+def get_chart_totals(df, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """Chart totals for a filter selection, served from the shared memo when df is the cached frame"""
+    if df is DATA_CACHE:
+        return cached_chart_totals(DATA_VERSION, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    return build_chart_totals(df, start_date, end_date, batch_filter, exam_filter, plan_filter)
+
+def parse_filter_key(filter_key):
+    """(start_date, end_date, batch, exam, plan) selection stored by update_dashboard in filtered-data-store"""
+    _, start_date, end_date, batch_filter, exam_filter, plan_filter = json.loads(filter_key)
+    return start_date, end_date, tuple(batch_filter), tuple(exam_filter), tuple(plan_filter)
+
+def get_filtered_data(filter_key):
+    """Row-level data for a filter selection stored by update_dashboard in filtered-data-store"""
+    df = load_data_from_sheets(force_refresh=False)
+    return get_filtered_rows(df, *parse_filter_key(filter_key))
+
+def get_export_totals(filter_key):
+    """Chart totals for a filter selection stored by update_dashboard in filtered-data-store"""
+    df = load_data_from_sheets(force_refresh=False)
+    return get_chart_totals(df, *parse_filter_key(filter_key))
+
+def build_batch_export(filtered_df):
+    """Per-batch summary of the filtered rows with a TOTAL row, or None when there is no batch column"""
+    if 'name' not in filtered_df.columns:
+        return None
+    
+    # Aggregate data by batch
+    agg_dict = {}
+    
+    if 'Exam_2' in filtered_df.columns:
+        agg_dict['Exam_2'] = 'first'
+    
+    if 'net_amount' in filtered_df.columns:
+        agg_dict['net_amount'] = 'sum'
+    
+    if 'leader_fin' in filtered_df.columns:
+        agg_dict['leader_fin'] = 'first'
+    
+    # Group by batch name
+    export_df = filtered_df.groupby('name', observed=True).agg(agg_dict).reset_index()
+    
+    # Add enrollment count
+    enrollment_counts = filtered_df.groupby('name', observed=True).size().reset_index(name='Total Enrollments')
+    export_df = export_df.merge(enrollment_counts, on='name', how='left')
+    
+    # Add order type counts
+    if 'order_type' in filtered_df.columns:
+        order_primary = filtered_df[filtered_df['order_type'] == 'PRIMARY'].groupby('name', observed=True).size().reset_index(name='Primary Orders')
+        order_upgrade = filtered_df[filtered_df['order_type'] == 'UPGRADE'].groupby('name', observed=True).size().reset_index(name='Upgrade Orders')
+        export_df = export_df.merge(order_primary, on='name', how='left')
+        export_df = export_df.merge(order_upgrade, on='name', how='left')
+        export_df['Primary Orders'] = export_df['Primary Orders'].fillna(0).astype(int)
+        export_df['Upgrade Orders'] = export_df['Upgrade Orders'].fillna(0).astype(int)
+    
+    # Rename columns
+    export_df = export_df.rename(columns={
+        'name': 'Batch Name',
+        'Exam_2': 'Exam Category',
+        'net_amount': 'Total Revenue (₹ Cr)',
+        'leader_fin': 'Leader'
+    })
+    
+    # Convert revenue to Crores
+    if 'Total Revenue (₹ Cr)' in export_df.columns:
+        export_df['Total Revenue (₹ Cr)'] = export_df['Total Revenue (₹ Cr)'] / 10000000
+    
+    # Reorder columns
+    cols_order = ['Batch Name', 'Total Enrollments', 'Exam Category', 'Total Revenue (₹ Cr)', 
+                 'Primary Orders', 'Upgrade Orders', 'Leader']
+    final_cols = [col for col in cols_order if col in export_df.columns]
+    export_df = export_df[final_cols]
+    
+    # Sort by Total Enrollments
+    export_df = export_df.sort_values('Total Enrollments', ascending=False)
+    
+    # Add total row at the bottom, in place (the sorted index is a permutation of 0..n-1, so label n is new)
+    total_row = batch_total_row(export_df)
+    export_df.loc[len(export_df)] = [total_row[col] for col in export_df.columns]
+    return export_df
+
+def batch_total_row(export_df):
+    """TOTAL row for a batch summary: sums of its EXPORT_SUM_COLUMNS, blanks elsewhere"""
+    # Membership checks against a plain set rather than through pd.Index
+    columns = set(export_df.columns)
+    sum_cols = [col for col in EXPORT_SUM_COLUMNS if col in columns]
+    # One C reduction down the columns of a single float64 block, no per-column Series
+    totals = export_df[sum_cols].to_numpy(dtype='float64').sum(axis=0).tolist()
+    # Count totals go back in as ints so those columns stay integer once the row is appended
+    sums = {col: int(total) if export_df[col].dtype.kind in 'iu' else total for col, total in zip(sum_cols, totals)}
+    return {col: 'TOTAL' if col == 'Batch Name' else sums.get(col, '') for col in export_df.columns}
+
+@data_memo(maxsize=16)
+def cached_batch_export(data_version, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """build_batch_export on the cached data, memoized so repeated exports skip the groupbys"""
+    filtered_df = cached_filtered_data(data_version, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    export_df = build_batch_export(filtered_df)
+    return export_df if export_df is None else freeze_frame(export_df)
+
+@data_memo(maxsize=16)
+def cached_batch_file(data_version, file_format, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """Batch summary file bytes for the cached data, memoized so repeated downloads skip the write"""
+    export_df = cached_batch_export(data_version, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    return None if export_df is None else export_bytes(export_df, file_format, 'Batch Summary')
+
+def get_batch_file(filter_key, file_format):
+    """Batch summary file bytes for a filter selection stored by update_dashboard in filtered-data-store"""
+    df = load_data_from_sheets(force_refresh=False)
+    selection = parse_filter_key(filter_key)
+    if df is DATA_CACHE:
+        return cached_batch_file(DATA_VERSION, file_format, *selection)
+    export_df = build_batch_export(filter_data(df, *selection))
+    return None if export_df is None else export_bytes(export_df, file_format, 'Batch Summary')
+
+def summarize_cube(cube, last_7):
+    """Total enrollments, last-7-days enrollments and revenue for the summary cards, from the cube and its daily last-7-days totals"""
+    enrollments = cube['enrollments'].to_numpy()
+    revenue = cube['net_amount'].to_numpy(dtype='float64').sum() if 'net_amount' in cube.columns else 0
+    return int(enrollments.sum()), int(last_7['enrollments'].sum()), revenue
+
+def set_data_cache(df, timestamp):
+    """Install freshly loaded data as the shared cache along with its derived filter options"""
+    global DATA_CACHE, CACHE_TIMESTAMP, DATA_VERSION, FILTER_OPTIONS, FILTER_SEARCH_INDEX, FILTER_CHOICES, DATA_CUBE
+    # Build everything derived from df first, so a failure leaves the previous data fully in place
+    options = build_filter_options(df)
+    choices = {col: [{'label': f' {value}', 'value': value} for value in values]
+               for col, values in options.items()}
+    # Each column's choices travel with their index, so a keystroke during a reload never pairs
+    # one version's offsets with another version's option list
+    search_index = {col: (choices[col],) + build_search_index(values) for col, values in options.items()}
+    cube = build_enrollment_cube(df)
+    
+    # Then publish it all together; shared read-only by every callback, so no per-request copies
+    FILTER_OPTIONS, FILTER_CHOICES, FILTER_SEARCH_INDEX, DATA_CUBE = options, choices, search_index, cube
+    DATA_CACHE = freeze_frame(df)
+    CACHE_TIMESTAMP = timestamp
+    DATA_VERSION += 1
+    # Old entries hold views of the previous frame; drop them now rather than leave up to a
+    # memo's maxsize of old generations alive until newer keys push them out
+    for memo in DATA_MEMOS:
+        memo.cache_clear()
+
+def search_filter_options(column, search_value):
+    """Checklist options whose value contains the search text (the prebuilt full list when the search is blank)"""
+    # Keystrokes never refetch from Sheets: expired data is refreshed by update_dashboard, not by typing
+    if DATA_CACHE is None:
+        load_data_from_sheets(force_refresh=False)
+    # One lookup: the option list and its search index always come from the same data version
+    choices, text, starts = FILTER_SEARCH_INDEX.get(column, ([], '', []))
+    if not search_value or search_value.strip() == '':
+        return choices
+    search_lower = search_value.strip().lower()
+    
+    # str.find scans the joined text in C; each hit maps back to its option through the start offsets
+    matches = []
+    pos = text.find(search_lower)
+    while pos != -1:
+        i = bisect_right(starts, pos) - 1
+        matches.append(choices[i])
+        # Resume at the next option so each option is listed once
+        pos = text.find(search_lower, starts[i + 1]) if i + 1 < len(starts) else -1
+    return matches
+
+def export_timestamp():
+    """Current local time as YYYYMMDD_HHMMSS for export filenames, formatted without strftime"""
+    now = datetime.now()
+    return f"{now.year:04d}{now.month:02d}{now.day:02d}_{now.hour:02d}{now.minute:02d}{now.second:02d}"
+
+def excel_bytes(export_df, sheet_name):
+    """export_df as an xlsx file written with xlsxwriter, split across sheet_name_1, _2, ... when it is long"""
+    buffer = io.BytesIO()
+    # Not constant_memory: pandas writes cells column by column, and that mode only keeps the current row
+    with pd.ExcelWriter(buffer, engine='xlsxwriter', engine_kwargs=EXCEL_WRITER_OPTIONS) as writer:
+        if len(export_df) <= EXCEL_SHEET_ROWS:
+            export_df.to_excel(writer, index=False, sheet_name=sheet_name)
+        else:
+            # Fixed-size row chunks keep each formatting pass small and every sheet under Excel's row cap
+            for i, start in enumerate(range(0, len(export_df), EXCEL_SHEET_ROWS)):
+                export_df.iloc[start:start + EXCEL_SHEET_ROWS].to_excel(writer, index=False, sheet_name=f"{sheet_name}_{i + 1}")
+    return buffer.getvalue()
+
+def export_bytes(export_df, file_format, sheet_name):
+    """export_df as a CSV file, or as an xlsx (split into sheet_name_1, _2, ... when long) when file_format is 'xlsx'"""
+    if file_format == 'xlsx':
+        return excel_bytes(export_df, sheet_name)
+    # UTF-8 with a BOM so Excel keeps the ₹ in the headers when it opens the CSV
+    return export_df.to_csv(index=False).encode('utf-8-sig')
+
+def send_excel(export_df, filename, sheet_name):
+    """Download payload for export_df as an xlsx, split across numbered sheets when it is long"""
+    return dcc.send_bytes(excel_bytes(export_df, sheet_name), filename)
+
+def read_cache_file(current_time):
+    """Return the on-disk cached data if it is still fresh, otherwise None"""
+    try:
+        if os.path.exists(CACHE_FILE) and (current_time - os.path.getmtime(CACHE_FILE)) < CACHE_DURATION:
+            return pd.read_parquet(CACHE_FILE, memory_map=True)
+    except Exception as e:
+        print(f"Error reading cache file: {e}")
+    return None
+
+def _same_parquet_type(dtype, written):
+    """Whether a column's Parquet pandas metadata records the dtype it was written from"""
+    if written is None:
+        return False
+    if isinstance(dtype, pd.CategoricalDtype):
+        # Categoricals record their code dtype as numpy_type
+        return written['pandas_type'] == 'categorical'
+    return written['numpy_type'] == str(dtype)
+
+def write_cache_file(df):
+    """Write the cleaned data to the on-disk cache (atomically, so readers never see a partial file)"""
+    tmp_file = f"{CACHE_FILE}.tmp"
+    try:
+        df.to_parquet(tmp_file, compression='zstd', index=False)
+        # Check the file's footer (no data read back), so a short or retyped file is never published
+        metadata = pq.read_metadata(tmp_file)
+        written = {col['name']: col for col in metadata.schema.to_arrow_schema().pandas_metadata['columns']}
+        changed = [col for col in df.columns if not _same_parquet_type(df[col].dtype, written.get(col))]
+        if metadata.num_rows != len(df) or changed:
+            raise ValueError(f"wrote {metadata.num_rows} of {len(df)} rows, dtypes changed for {changed}")
+        os.replace(tmp_file, CACHE_FILE)
+    except Exception as e:
+        print(f"Error writing cache file: {e}")
+        if os.path.exists(tmp_file):
+            os.remove(tmp_file)
+
+def fetch_sheet_values(client):
+    """Call the Sheets values:batchGet endpoint directly and parse the response with orjson"""
+    # The client's authorized session keeps the connection alive and refreshes the token
+    # (the gviz CSV export is not used: it returns formatted text and nulls mixed-type cells)
+    params = dict(SHEETS_VALUE_PARAMS, ranges=WORKSHEET_RANGES)
+    response = client.request('get', SPREADSHEET_VALUES_BATCH_URL % SPREADSHEET_ID, params=params)
+    return orjson.loads(response.content).get('valueRanges', [])
+
+def get_sheets_client():
+    """Authorized gspread client, created once per process and reused across refreshes"""
+    global SHEETS_CLIENT
+    # The client's session refreshes its access token itself, so it never needs rebuilding
+    if SHEETS_CLIENT is None:
+        SHEETS_CLIENT = gspread.authorize(get_google_credentials())
+    return SHEETS_CLIENT
+
 def load_data_from_sheets(force_refresh=False):
     """Load data from Google Sheets (all worksheets) with caching for performance"""
-    global DATA_CACHE, CACHE_TIMESTAMP
-    
     # Check cache
     current_time = time.time()
     if not force_refresh and DATA_CACHE is not None:
         if CACHE_TIMESTAMP is not None and (current_time - CACHE_TIMESTAMP) < CACHE_DURATION:
-            print(f"✓ Using cached data")
-            return DATA_CACHE.copy()
+            _log(f"✓ Using cached data")
+            return DATA_CACHE
+    
+    # Fall back to the on-disk cache written by an earlier process
+    if not force_refresh:
+        cached_df = read_cache_file(current_time)
+        if cached_df is not None:
+            _log(f"✓ Using cached data from {CACHE_FILE}")
+            set_data_cache(cached_df, os.path.getmtime(CACHE_FILE))
+            return DATA_CACHE
     
-    print(f"⟳ Loading fresh data from all sheets...")
+    _log(f"⟳ Loading fresh data from all sheets...")
     start_time = time.time()
     
     try:
-        creds = get_google_credentials()
-        client = gspread.authorize(creds)
+        client = get_sheets_client()
         
-        spreadsheet = client.open_by_key(SPREADSHEET_ID)
+        # Fetch every worksheet in a single batchGet round-trip
+        value_ranges = fetch_sheet_values(client)
         
         all_dfs = []
-        for worksheet_name in WORKSHEET_NAMES:
-            print(f"  Loading {worksheet_name}...")
+        for worksheet_name, value_range in zip(WORKSHEET_NAMES, value_ranges):
+            _log(f"  Loading {worksheet_name}...")
             try:
-                worksheet = spreadsheet.worksheet(worksheet_name)
-                
-                # Get all values to find the correct header row
-                data = worksheet.get_all_values()
-                
-                # Find where the actual data starts (skip metadata rows)
-                header_row = 0
-                for i, row in enumerate(data):
-                    if row and any(col in str(row).lower() for col in ['batchid', '_id', 'name', 'converteddate']):
-                        header_row = i
-                        print(f"    Found header at row {header_row + 1}")
-                        break
-                
-                # Create DataFrame from the correct header row
-                sheet_df = pd.DataFrame(data[header_row + 1:], columns=data[header_row])
-                print(f"    Loaded {len(sheet_df)} rows from {worksheet_name}")
+                values = value_range.get('values', [])
+                if not values:
+                    _log(f"    No values returned for {worksheet_name}")
+                    continue
                 
-                # Clean column names
-                sheet_df.columns = sheet_df.columns.str.strip()
+                # The range starts at the header row, so this normally returns 0
+                header_row = find_header_row(values)
+                sheet_df = build_sheet_frame(values[header_row], values[header_row + 1:])
+                _log(f"    Loaded {len(sheet_df)} rows from {worksheet_name}")
                 
                 # Handle column name variations
                 if 'batch_name' in sheet_df.columns and 'name' not in sheet_df.columns:
@@ -124,43 +681,29 @@ def load_data_from_sheets(force_refresh=False):
                 'leader_fin', 'type_2'
             ])
         
-        df = pd.concat(all_dfs, ignore_index=True)
-        print(f"  Combined {len(df)} total rows from {len(all_dfs)} sheets")
-        print(f"  Columns found: {list(df.columns)[:10]}...")  # Show first 10 columns
+        # Align every sheet to the same column set so concat doesn't re-allocate mismatched blocks
+        common_cols = list(dict.fromkeys(col for sheet_df in all_dfs for col in sheet_df.columns))
+        all_dfs = align_categories([sheet_df.reindex(columns=common_cols, copy=False) for sheet_df in all_dfs])
+        df = pd.concat(all_dfs, ignore_index=True, copy=False, sort=False)
+        _log(f"  Combined {len(df)} total rows from {len(all_dfs)} sheets")
         
         # Convert date columns with proper handling
-        if 'converteddate' in df.columns:
-            df['converteddate'] = pd.to_datetime(df['converteddate'], errors='coerce')
-            print(f"  Converted 'converteddate' to datetime")
-        if 'startdate' in df.columns:
-            df['startdate'] = pd.to_datetime(df['startdate'], errors='coerce')
-        
-        # Convert numeric columns and optimize data types for memory
-        numeric_cols = ['net_amount', 'coupondiscount', 'donationamount', 'ADD_ON_STORE']
-        for col in numeric_cols:
+        for col in DATE_COLUMNS:
             if col in df.columns:
-                df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0)
-                # Use float32 instead of float64 to save memory
-                df[col] = df[col].astype('float32')
+                df[col] = parse_sheet_dates(df[col])
         
-        # Optimize string columns - convert to category dtype for repeated values
-        string_cols = ['name', 'plan', 'Exam_2', 'order_type', 'batch_eligibility', 
-                      'couponcode', 'couponid', 'leader_fin', 'type_2']
-        for col in string_cols:
-            if col in df.columns and df[col].dtype == 'object':
-                # Convert to category if column has less than 50% unique values
-                if df[col].nunique() / len(df) < 0.5:
-                    df[col] = df[col].astype('category')
+        # Downcast numeric columns and categorize repetitive strings in a single cast
+        df = shrink_dtypes(df)
         
-        # Remove empty rows
-        df = df.dropna(how='all')
-        
-        # Remove rows with NaT dates if converteddate is required
+        # Remove empty rows and rows with NaT dates in one pass (blank rows have no date either)
         if 'converteddate' in df.columns:
             before_count = len(df)
             df = df[df['converteddate'].notna()]
             if before_count != len(df):
-                print(f"  Removed {before_count - len(df)} rows with invalid dates")
+                _log(f"  Removed {before_count - len(df)} rows with invalid dates")
+            
+            # Keep rows in date order so date filters can binary-search instead of scanning
+            df = df.sort_values('converteddate', kind='stable', ignore_index=True)
         
         # Handle empty data
         if len(df) == 0:
@@ -173,17 +716,13 @@ def load_data_from_sheets(force_refresh=False):
             ])
         
         # Cache the data
-        DATA_CACHE = df.copy()
-        CACHE_TIMESTAMP = current_time
+        set_data_cache(df, current_time)
+        write_cache_file(df)
         
         load_time = time.time() - start_time
         print(f"✓ Loaded {len(df)} rows in {load_time:.2f}s")
-        if 'converteddate' in df.columns:
-            print(f"  Date range: {df['converteddate'].min()} to {df['converteddate'].max()}")
-        if 'name' in df.columns:
-            print(f"  Unique batches: {df['name'].nunique()}")
-        if 'Exam_2' in df.columns:
-            print(f"  Unique exams: {df['Exam_2'].nunique()}")
+        if DEBUG:
+            _log_data_profile(df)
         
         return df
     
@@ -206,7 +745,9 @@ app = Dash(__name__,
             title="Batch Enrollment Dashboard", 
             suppress_callback_exceptions=True,
             external_stylesheets=[dbc.themes.BOOTSTRAP],
-            external_scripts=['https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js'])
+            # Deferred so the screenshot library downloads alongside Dash's bundles instead of blocking them
+            external_scripts=[{'src': 'https://cdnjs.cloudflare.com/ajax/libs/html2canvas/1.4.1/html2canvas.min.js',
+                               'defer': 'defer'}])
 server = app.server  # For Vercel deployment
 
 # Load initial data only in local development, not on cloud platforms
@@ -265,7 +806,7 @@ app.layout = html.Div([
                     html.Div([
                         dcc.Checklist(
                             id='batch-filter',
-                            options=[{'label': f' {name}', 'value': name} for name in sorted(df['name'].unique()) if pd.notna(name)] if 'name' in df.columns else [],
+                            options=FILTER_CHOICES.get('name', []),
                             value=[],
                             inline=False,
                             style={'maxHeight': '150px', 'overflowY': 'auto', 'padding': '10px', 'backgroundColor': 'white'}
@@ -289,7 +830,7 @@ app.layout = html.Div([
                     html.Div([
                         dcc.Checklist(
                             id='exam-filter',
-                            options=[{'label': f' {exam}', 'value': exam} for exam in sorted(df['Exam_2'].unique()) if pd.notna(exam)] if 'Exam_2' in df.columns else [],
+                            options=FILTER_CHOICES.get('Exam_2', []),
                             value=[],
                             inline=False,
                             style={'maxHeight': '150px', 'overflowY': 'auto', 'padding': '10px', 'backgroundColor': 'white'}
@@ -313,7 +854,7 @@ app.layout = html.Div([
                     html.Div([
                         dcc.Checklist(
                             id='plan-filter',
-                            options=[{'label': f' {plan}', 'value': plan} for plan in sorted(df['plan'].unique()) if pd.notna(plan) and str(plan).strip() != ''] if 'plan' in df.columns else [],
+                            options=FILTER_CHOICES.get('plan', []),
                             value=[],
                             inline=False,
                             style={'maxHeight': '150px', 'overflowY': 'auto', 'padding': '10px', 'backgroundColor': 'white'}
@@ -422,6 +963,10 @@ app.layout = html.Div([
                            style={'padding': '5px 15px', 'backgroundColor': '#4CAF50', 'color': 'white', 
                                   'border': 'none', 'borderRadius': '5px', 'cursor': 'pointer', 
                                   'fontSize': '12px', 'fontWeight': 'bold', 'marginRight': '10px'}),
+                dcc.Dropdown(id='export-format', value='csv', clearable=False, searchable=False,
+                             options=[{'label': 'CSV', 'value': 'csv'}, {'label': 'Excel', 'value': 'xlsx'}],
+                             style={'display': 'inline-block', 'width': '90px', 'fontSize': '12px',
+                                    'verticalAlign': 'middle', 'marginRight': '10px'}),
                 html.Button('📸 Download Screenshot', id='screenshot-table-btn', n_clicks=0,
                            style={'padding': '5px 15px', 'backgroundColor': '#2196F3', 'color': 'white', 
                                   'border': 'none', 'borderRadius': '5px', 'cursor': 'pointer', 
@@ -439,99 +984,133 @@ app.layout = html.Div([
                style={'textAlign': 'center', 'color': '#666', 'fontSize': '12px', 'marginTop': '20px'}),
     ]),
     
-    # Hidden div to store filtered data for exports
+    # Hidden div holding the current filter selection, so exports can rebuild the filtered data server-side
     html.Div(id='filtered-data-store', style={'display': 'none'}),
     
-    # Store for dropdown states
-    dcc.Store(id='batch-dropdown-state', data={'open': False}),
-    dcc.Store(id='exam-dropdown-state', data={'open': False}),
-    dcc.Store(id='plan-dropdown-state', data={'open': False}),
+    # Store for dropdown state
+    dcc.Store(id='dropdown-state', data={'open': False}),
     
 ], style={'fontFamily': 'Arial, sans-serif', 'padding': '20px', 'backgroundColor': '#f5f5f5'})
 
 # ========================================================================================================
-# CLIENTSIDE CALLBACKS FOR DROPDOWN BLUR
+# CLIENTSIDE CALLBACKS FOR DROPDOWNS
 # ========================================================================================================
 
-# Close dropdown when clicking outside - Batch
+# Open each dropdown on focus and close it when clicking outside - one shared document listener
 app.clientside_callback(
     """
-    function(n_clicks) {
+    function(id) {
         setTimeout(function() {
-            const searchInput = document.getElementById('batch-search');
-            const dropdown = document.getElementById('batch-dropdown');
+            const names = ['batch', 'exam', 'plan'];
             
-            if (searchInput && dropdown) {
-                searchInput.addEventListener('focus', function() {
-                    dropdown.style.display = 'block';
-                });
-                
-                document.addEventListener('click', function(e) {
-                    if (!searchInput.contains(e.target) && !dropdown.contains(e.target)) {
+            names.forEach(function(name) {
+                const searchInput = document.getElementById(name + '-search');
+                const dropdown = document.getElementById(name + '-dropdown');
+                if (searchInput && dropdown) {
+                    searchInput.addEventListener('focus', function() {
+                        dropdown.style.display = 'block';
+                    });
+                }
+            });
+            
+            document.addEventListener('click', function(e) {
+                names.forEach(function(name) {
+                    const searchInput = document.getElementById(name + '-search');
+                    const dropdown = document.getElementById(name + '-dropdown');
+                    if (searchInput && dropdown && !searchInput.contains(e.target) && !dropdown.contains(e.target)) {
                         dropdown.style.display = 'none';
                     }
                 });
-            }
+            });
         }, 100);
         return window.dash_clientside.no_update;
     }
     """,
-    Output('batch-dropdown-state', 'data'),
+    Output('dropdown-state', 'data'),
     Input('batch-search', 'id')
 )
 
-# Close dropdown when clicking outside - Exam
-app.clientside_callback(
-    """
-    function(n_clicks) {
-        setTimeout(function() {
-            const searchInput = document.getElementById('exam-search');
-            const dropdown = document.getElementById('exam-dropdown');
-            
-            if (searchInput && dropdown) {
-                searchInput.addEventListener('focus', function() {
-                    dropdown.style.display = 'block';
-                });
-                
-                document.addEventListener('click', function(e) {
-                    if (!searchInput.contains(e.target) && !dropdown.contains(e.target)) {
-                        dropdown.style.display = 'none';
-                    }
-                });
-            }
-        }, 100);
-        return window.dash_clientside.no_update;
-    }
-    """,
-    Output('exam-dropdown-state', 'data'),
-    Input('exam-search', 'id')
+# Toggle each dropdown's visibility in the browser - shown once its search box has a value
+for name in ('batch', 'exam', 'plan'):
+    app.clientside_callback(
+        """
+        function(value, style) {
+            const display = (value === null || value === undefined) ? 'none' : 'block';
+            return Object.assign({}, style, {display: display});
+        }
+        """,
+        Output(f'{name}-dropdown', 'style'),
+        Input(f'{name}-search', 'value'),
+        State(f'{name}-dropdown', 'style')
+    )
+
+# ========================================================================================================
+# CHART LAYOUTS
+# ========================================================================================================
+
+# Static figure layouts, built once; callbacks only supply the traces (and the trend charts' x range)
+OVERALL_CHART_LAYOUT = go.Layout(
+    title="Top 15 Batches by Enrollment",
+    xaxis_title="Number of Enrollments",
+    yaxis_title="Batch Name",
+    height=450,
+    showlegend=False,
+    margin=dict(t=60, b=50, l=150, r=100)
 )
 
-# Close dropdown when clicking outside - Plan
-app.clientside_callback(
-    """
-    function(n_clicks) {
-        setTimeout(function() {
-            const searchInput = document.getElementById('plan-search');
-            const dropdown = document.getElementById('plan-dropdown');
-            
-            if (searchInput && dropdown) {
-                searchInput.addEventListener('focus', function() {
-                    dropdown.style.display = 'block';
-                });
-                
-                document.addEventListener('click', function(e) {
-                    if (!searchInput.contains(e.target) && !dropdown.contains(e.target)) {
-                        dropdown.style.display = 'none';
-                    }
-                });
-            }
-        }, 100);
-        return window.dash_clientside.no_update;
-    }
-    """,
-    Output('plan-dropdown-state', 'data'),
-    Input('plan-search', 'id')
+LAST_7_CHART_LAYOUT = go.Layout(
+    title='Daily Enrollment Trend (Last 7 Days)',
+    xaxis_title='Date',
+    yaxis_title='Total Enrollments',
+    height=500,
+    hovermode='x unified',
+    showlegend=False,
+    margin=dict(t=60, b=100, l=80, r=80),
+    xaxis=dict(
+        tickangle=-45,
+        tickmode='auto',
+        automargin=True,
+        type='category'
+    ),
+    yaxis=dict(
+        rangemode='tozero'
+    )
+)
+
+REVENUE_TREND_CHART_LAYOUT = go.Layout(
+    title='Daily Revenue Trend (Last 7 Days)',
+    xaxis_title='Date',
+    yaxis_title='Revenue (₹ Cr)',
+    height=500,
+    hovermode='x unified',
+    yaxis=dict(
+        tickformat='.2f', 
+        tickprefix='₹', 
+        ticksuffix=' Cr',
+        rangemode='tozero'
+    ),
+    margin=dict(t=60, b=100, l=80, r=80),
+    xaxis=dict(
+        tickangle=-45,
+        tickmode='auto',
+        automargin=True,
+        type='category'
+    )
+)
+
+EXAM_DISTRIBUTION_CHART_LAYOUT = go.Layout(
+    height=300, 
+    showlegend=True,
+    margin=dict(t=50, b=30, l=50, r=50)
+)
+
+REVENUE_BY_EXAM_CHART_LAYOUT = go.Layout(
+    title="Top 10 Exams by Revenue",
+    xaxis_title="Revenue (₹ Cr)",
+    yaxis_title="Exam Category",
+    height=300,
+    showlegend=False,
+    margin=dict(t=50, b=40, l=120, r=100)
 )
 
 # ========================================================================================================
@@ -544,18 +1123,8 @@ app.clientside_callback(
     Input('batch-search', 'value')
 )
 def update_batch_options(search_value):
-    temp_df = load_data_from_sheets(force_refresh=False)
-    all_batches = sorted(temp_df['name'].unique()) if 'name' in temp_df.columns else []
-    all_batches = [b for b in all_batches if pd.notna(b)]
-    
-    # If search is None or empty, show all
-    if not search_value or search_value.strip() == '':
-        return [{'label': f' {name}', 'value': name} for name in all_batches]
-    
-    # Filter based on search
-    search_lower = search_value.strip().lower()
-    filtered = [b for b in all_batches if search_lower in b.lower()]
-    return [{'label': f' {name}', 'value': name} for name in filtered]
+    # All options when the search is empty, otherwise only those containing the search text
+    return search_filter_options('name', search_value)
 
 # Update exam filter options based on search
 @callback(
@@ -563,18 +1132,8 @@ def update_batch_options(search_value):
     Input('exam-search', 'value')
 )
 def update_exam_options(search_value):
-    temp_df = load_data_from_sheets(force_refresh=False)
-    all_exams = sorted(temp_df['Exam_2'].unique()) if 'Exam_2' in temp_df.columns else []
-    all_exams = [e for e in all_exams if pd.notna(e)]
-    
-    # If search is None or empty, show all
-    if not search_value or search_value.strip() == '':
-        return [{'label': f' {exam}', 'value': exam} for exam in all_exams]
-    
-    # Filter based on search
-    search_lower = search_value.strip().lower()
-    filtered = [e for e in all_exams if search_lower in e.lower()]
-    return [{'label': f' {exam}', 'value': exam} for exam in filtered]
+    # All options when the search is empty, otherwise only those containing the search text
+    return search_filter_options('Exam_2', search_value)
 
 # Update plan filter options based on search
 @callback(
@@ -582,65 +1141,8 @@ def update_exam_options(search_value):
     Input('plan-search', 'value')
 )
 def update_plan_options(search_value):
-    temp_df = load_data_from_sheets(force_refresh=False)
-    all_plans = sorted(temp_df['plan'].unique()) if 'plan' in temp_df.columns else []
-    # Filter out NaN, None, empty string, and 'None' string values
-    all_plans = [p for p in all_plans if pd.notna(p) and str(p).strip() != '' and str(p).strip().lower() != 'none']
-    
-    # If search is None or empty, show all
-    if not search_value or search_value.strip() == '':
-        return [{'label': f' {plan}', 'value': plan} for plan in all_plans]
-    
-    # Filter based on search
-    search_lower = search_value.strip().lower()
-    filtered = [p for p in all_plans if search_lower in str(p).lower()]
-    return [{'label': f' {plan}', 'value': plan} for plan in filtered]
-    return [{'label': f' {plan}', 'value': plan} for plan in filtered]
-
-# Toggle batch dropdown visibility
-@callback(
-    Output('batch-dropdown', 'style'),
-    Input('batch-search', 'value')
-)
-def update_batch_dropdown(search_value):
-    # Show dropdown when there's any text or empty (to trigger search update)
-    if search_value is not None:
-        return {'display': 'block', 'position': 'absolute', 'zIndex': '1000', 
-                'border': '1px solid #ccc', 'borderRadius': '4px', 
-                'backgroundColor': 'white', 'width': '100%', 'marginTop': '2px'}
-    return {'display': 'none', 'position': 'absolute', 'zIndex': '1000', 
-            'border': '1px solid #ccc', 'borderRadius': '4px', 
-            'backgroundColor': 'white', 'width': '100%', 'marginTop': '2px'}
-
-# Toggle exam dropdown visibility
-@callback(
-    Output('exam-dropdown', 'style'),
-    Input('exam-search', 'value')
-)
-def update_exam_dropdown(search_value):
-    # Show dropdown when there's any text or empty (to trigger search update)
-    if search_value is not None:
-        return {'display': 'block', 'position': 'absolute', 'zIndex': '1000', 
-                'border': '1px solid #ccc', 'borderRadius': '4px', 
-                'backgroundColor': 'white', 'width': '100%', 'marginTop': '2px'}
-    return {'display': 'none', 'position': 'absolute', 'zIndex': '1000', 
-            'border': '1px solid #ccc', 'borderRadius': '4px', 
-            'backgroundColor': 'white', 'width': '100%', 'marginTop': '2px'}
-
-# Toggle plan dropdown visibility
-@callback(
-    Output('plan-dropdown', 'style'),
-    Input('plan-search', 'value')
-)
-def update_plan_dropdown(search_value):
-    # Show dropdown when there's any text or empty (to trigger search update)
-    if search_value is not None:
-        return {'display': 'block', 'position': 'absolute', 'zIndex': '1000', 
-                'border': '1px solid #ccc', 'borderRadius': '4px', 
-                'backgroundColor': 'white', 'width': '100%', 'marginTop': '2px'}
-    return {'display': 'none', 'position': 'absolute', 'zIndex': '1000', 
-            'border': '1px solid #ccc', 'borderRadius': '4px', 
-            'backgroundColor': 'white', 'width': '100%', 'marginTop': '2px'}
+    # All options when the search is empty, otherwise only those containing the search text
+    return search_filter_options('plan', search_value)
 
 # Reset all filters
 @callback(
@@ -671,48 +1173,55 @@ def reset_filters(n_clicks):
      Input('date-filter', 'end_date'),
      Input('batch-filter', 'value'),
      Input('exam-filter', 'value'),
-     Input('plan-filter', 'value')]
+     Input('plan-filter', 'value')],
+    State('filtered-data-store', 'children')
 )
-def update_dashboard(start_date, end_date, batch_filter, exam_filter, plan_filter):
+def update_dashboard(start_date, end_date, batch_filter, exam_filter, plan_filter, current_key):
     # Load data (cached) - combines all sheets
     global df
     df = load_data_from_sheets(force_refresh=False)
     
-    print(f"DEBUG: Loaded {len(df)} rows")
-    if 'converteddate' in df.columns and not df.empty:
-        print(f"DEBUG: Date range in data: {df['converteddate'].min()} to {df['converteddate'].max()}")
-    if 'name' in df.columns and not df.empty:
-        print(f"DEBUG: Sample batch names: {df['name'].head(3).tolist()}")
-        print(f"DEBUG: Total unique batches: {df['name'].nunique()}")
-    if 'Exam_2' in df.columns and not df.empty:
-        print(f"DEBUG: Unique exams: {sorted(df['Exam_2'].unique())[:5]}")
-    
-    # Filter data
-    filtered_df = df.copy()
-    
-    if 'converteddate' in filtered_df.columns:
-        print(f"DEBUG: Filtering by dates: {start_date} to {end_date}")
-        filtered_df = filtered_df[(filtered_df['converteddate'] >= start_date) & 
-                                  (filtered_df['converteddate'] <= end_date)]
-        print(f"DEBUG: After date filter: {len(filtered_df)} rows")
+    # Same values in any order are the same selection, so they share one memoized result
+    batch_filter, exam_filter, plan_filter = (tuple(sorted(selected or ()))
+                                              for selected in (batch_filter, exam_filter, plan_filter))
+    # Only the filter selection goes to the browser; exports rebuild the rows from the server-side cache
+    filter_key = json.dumps([DATA_VERSION, start_date, end_date, batch_filter, exam_filter, plan_filter])
+    if filter_key == current_key:
+        # Same selection over the same data (e.g. Reset with nothing selected) - keep what's on screen
+        return (dash.no_update,) * 8
     
-    if batch_filter and len(batch_filter) > 0 and 'name' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['name'].isin(batch_filter)]
-        print(f"DEBUG: After batch filter: {len(filtered_df)} rows")
+    # Date range and unique counts are profiled once per load (_log_data_profile), not per callback
+    _log(f"DEBUG: Loaded {len(df)} rows")
     
-    if exam_filter and len(exam_filter) > 0 and 'Exam_2' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['Exam_2'].isin(exam_filter)]
-        print(f"DEBUG: After exam filter: {len(filtered_df)} rows")
+    if df is DATA_CACHE:
+        outputs = cached_dashboard(DATA_VERSION, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    else:
+        outputs = build_dashboard(df, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    return outputs + (filter_key,)
+
+@data_memo(maxsize=64)
+def cached_dashboard(data_version, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """build_dashboard on the cached data, memoized per filter selection; data_version keys out stale entries"""
+    return build_dashboard(DATA_CACHE, start_date, end_date, batch_filter, exam_filter, plan_filter)
+
+def build_dashboard(df, start_date, end_date, batch_filter, exam_filter, plan_filter):
+    """Summary cards, charts and batch table for one filter selection"""
+    # Filter data
+    _log(f"DEBUG: Filtering by dates: {start_date} to {end_date}")
+    filtered_df = get_filtered_rows(df, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    _log(f"DEBUG: After filters: {len(filtered_df)} rows")
     
-    if plan_filter and len(plan_filter) > 0 and 'plan' in filtered_df.columns:
-        filtered_df = filtered_df[filtered_df['plan'].isin(plan_filter)]
+    # Chart aggregates come from the pre-aggregated cube, shared with the chart exports
+    totals = get_chart_totals(df, start_date, end_date, batch_filter, exam_filter, plan_filter)
+    if totals is not None:
+        last_7_totals = totals['last_7']
     
     # Calculate metrics
-    total_enrollment = len(filtered_df)
-    last_7_days_df = filtered_df[filtered_df['converteddate'] >= (pd.Timestamp(end_date) - pd.Timedelta(days=7))] if 'converteddate' in filtered_df.columns else filtered_df
-    last_7_days_count = len(last_7_days_df)
-    
-    total_revenue = filtered_df['net_amount'].sum() if 'net_amount' in filtered_df.columns else 0
+    if totals is not None:
+        total_enrollment, last_7_days_count, total_revenue = totals['summary']
+    else:
+        total_enrollment = last_7_days_count = len(filtered_df)
+        total_revenue = 0
     
     # Convert to Crores
     total_revenue_cr = total_revenue / 10000000  # 1 Crore = 10 Million
@@ -745,8 +1254,8 @@ def update_dashboard(start_date, end_date, batch_filter, exam_filter, plan_filte
     ])
     
     # Chart 1: Overall Enrollment Batchwise
-    if 'name' in filtered_df.columns:
-        batch_enrollment = filtered_df['name'].value_counts().head(15).sort_values(ascending=True)
+    if totals is not None and 'by_name' in totals:
+        batch_enrollment = totals['by_name'].head(15).sort_values(ascending=True)
         fig1 = go.Figure(go.Bar(
             x=batch_enrollment.values,
             y=batch_enrollment.index,
@@ -754,130 +1263,70 @@ def update_dashboard(start_date, end_date, batch_filter, exam_filter, plan_filte
             marker=dict(color='#1976D2'),
             text=batch_enrollment.values,
             textposition='outside'
-        ))
-        fig1.update_layout(
-            title="Top 15 Batches by Enrollment",
-            xaxis_title="Number of Enrollments",
-            yaxis_title="Batch Name",
-            height=450,
-            showlegend=False,
-            margin=dict(t=60, b=50, l=150, r=100)
-        )
+        ), layout=OVERALL_CHART_LAYOUT)
     else:
         fig1 = go.Figure()
         fig1.add_annotation(text="No data available", showarrow=False)
     
     # Chart 2: Last 7 Days Enrollment
-    if 'converteddate' in last_7_days_df.columns:
-        # Group by date only (overall, not by batch)
-        last_7_trend = last_7_days_df.groupby('converteddate').size().reset_index(name='count')
-        # Format dates without time
-        last_7_trend['date_display'] = last_7_trend['converteddate'].dt.strftime('%d %b %Y')
-        
-        fig2 = go.Figure()
-        fig2.add_trace(go.Scatter(
-            x=last_7_trend['date_display'],
-            y=last_7_trend['count'],
+    if totals is not None:
+        # Totals by date only (overall, not by batch)
+        fig2 = go.Figure(go.Scatter(
+            x=last_7_totals['date_display'],
+            y=last_7_totals['enrollments'],
             mode='lines+markers+text',
             name='Total Enrollments',
             line=dict(color='#1976D2', width=3),
             marker=dict(size=10, color='#1976D2'),
-            text=last_7_trend['count'],
+            text=last_7_totals['enrollments'],
             textposition='top center',
             textfont=dict(size=12, color='#1976D2', family='Arial Black'),
             fill='tozeroy',
             fillcolor='rgba(25, 118, 210, 0.1)'
-        ))
-        fig2.update_layout(
-            title='Daily Enrollment Trend (Last 7 Days)',
-            xaxis_title='Date',
-            yaxis_title='Total Enrollments',
-            height=500,
-            hovermode='x unified',
-            showlegend=False,
-            margin=dict(t=60, b=100, l=80, r=80),
-            xaxis=dict(
-                tickangle=-45,
-                tickmode='auto',
-                automargin=True,
-                type='category',
-                range=[-0.5, len(last_7_trend)-0.5]
-            ),
-            yaxis=dict(
-                rangemode='tozero'
-            )
-        )
+        ), layout=LAST_7_CHART_LAYOUT)
+        fig2.update_xaxes(range=[-0.5, len(last_7_totals)-0.5])
     else:
         fig2 = go.Figure()
         fig2.add_annotation(text="No data available", showarrow=False)
     
     # Chart 2.5: Revenue Trend (Last 7 Days)
-    if 'converteddate' in last_7_days_df.columns and 'net_amount' in last_7_days_df.columns:
-        revenue_trend = last_7_days_df.groupby('converteddate')['net_amount'].sum().reset_index()
-        revenue_trend['net_amount_cr'] = revenue_trend['net_amount'] / 10000000  # Convert to Crores
-        # Format dates without time
-        revenue_trend['date_display'] = revenue_trend['converteddate'].dt.strftime('%d %b %Y')
+    if totals is not None and 'net_amount' in last_7_totals.columns:
+        revenue_trend_cr = last_7_totals['net_amount'] / 10000000  # Convert to Crores
         
-        fig2_5 = go.Figure()
-        fig2_5.add_trace(go.Scatter(
-            x=revenue_trend['date_display'],
-            y=revenue_trend['net_amount_cr'],
+        fig2_5 = go.Figure(go.Scatter(
+            x=last_7_totals['date_display'],
+            y=revenue_trend_cr,
             mode='lines+markers+text',
             name='Daily Revenue',
             line=dict(color='#4CAF50', width=3),
             marker=dict(size=10, color='#4CAF50'),
-            text=[f"₹{val:.2f} Cr" for val in revenue_trend['net_amount_cr']],
+            text=[f"₹{val:.2f} Cr" for val in revenue_trend_cr],
             textposition='top center',
             textfont=dict(size=12, color='#4CAF50', family='Arial Black'),
             fill='tozeroy',
             fillcolor='rgba(76, 175, 80, 0.1)'
-        ))
-        fig2_5.update_layout(
-            title='Daily Revenue Trend (Last 7 Days)',
-            xaxis_title='Date',
-            yaxis_title='Revenue (₹ Cr)',
-            height=500,
-            hovermode='x unified',
-            yaxis=dict(
-                tickformat='.2f', 
-                tickprefix='₹', 
-                ticksuffix=' Cr',
-                rangemode='tozero'
-            ),
-            margin=dict(t=60, b=100, l=80, r=80),
-            xaxis=dict(
-                tickangle=-45,
-                tickmode='auto',
-                automargin=True,
-                type='category',
-                range=[-0.5, len(revenue_trend)-0.5]
-            )
-        )
+        ), layout=REVENUE_TREND_CHART_LAYOUT)
+        fig2_5.update_xaxes(range=[-0.5, len(last_7_totals)-0.5])
     else:
         fig2_5 = go.Figure()
         fig2_5.add_annotation(text="No revenue data available", showarrow=False)
     
     # Chart 3: Exam Distribution
-    if 'Exam_2' in filtered_df.columns:
-        exam_dist = filtered_df['Exam_2'].value_counts()
+    if totals is not None and 'by_exam' in totals:
+        exam_dist = totals['by_exam']['enrollments']
         fig3 = go.Figure(go.Pie(
             labels=exam_dist.index,
             values=exam_dist.values,
             hole=0.4,
             marker=dict(colors=px.colors.qualitative.Set3)
-        ))
-        fig3.update_layout(
-            height=300, 
-            showlegend=True,
-            margin=dict(t=50, b=30, l=50, r=50)
-        )
+        ), layout=EXAM_DISTRIBUTION_CHART_LAYOUT)
     else:
         fig3 = go.Figure()
         fig3.add_annotation(text="No data available", showarrow=False)
     
     # Chart 4: Revenue by Exam
-    if 'Exam_2' in filtered_df.columns and 'net_amount' in filtered_df.columns:
-        revenue_by_exam = filtered_df.groupby('Exam_2')['net_amount'].sum().sort_values(ascending=False).head(10)
+    if totals is not None and 'by_exam' in totals and 'net_amount' in totals['by_exam'].columns:
+        revenue_by_exam = totals['by_exam']['net_amount'].sort_values(ascending=False).head(10)
         revenue_by_exam_cr = revenue_by_exam / 10000000  # Convert to Crores
         
         fig4 = go.Figure(go.Bar(
@@ -887,15 +1336,7 @@ def update_dashboard(start_date, end_date, batch_filter, exam_filter, plan_filte
             marker=dict(color='#4CAF50'),
             text=[f"₹{val:.2f} Cr" for val in revenue_by_exam_cr.values],
             textposition='outside'
-        ))
-        fig4.update_layout(
-            title="Top 10 Exams by Revenue",
-            xaxis_title="Revenue (₹ Cr)",
-            yaxis_title="Exam Category",
-            height=300,
-            showlegend=False,
-            margin=dict(t=50, b=40, l=120, r=100)
-        )
+        ), layout=REVENUE_BY_EXAM_CHART_LAYOUT)
     else:
         fig4 = go.Figure()
         fig4.add_annotation(text="No revenue data available", showarrow=False)
@@ -904,26 +1345,32 @@ def update_dashboard(start_date, end_date, batch_filter, exam_filter, plan_filte
     if 'name' in filtered_df.columns:
         # Aggregate data by batch
         agg_dict = {
-            'Exam_2': 'first',  # Get exam category (assuming same batch = same exam)
+            'Exam_2': ('Exam_2', 'first'),  # Get exam category (assuming same batch = same exam)
         }
         
         # Add revenue aggregation if column exists
         if 'net_amount' in filtered_df.columns:
-            agg_dict['net_amount'] = 'sum'
+            agg_dict['net_amount'] = ('net_amount', 'sum')
         
         # Add other useful columns
-        if 'order_type' in filtered_df.columns:
-            agg_dict['order_type'] = lambda x: f"{sum(x=='PRIMARY')} Primary, {sum(x=='UPGRADE')} Upgrade"
-        
         if 'leader_fin' in filtered_df.columns:
-            agg_dict['leader_fin'] = 'first'
+            agg_dict['leader_fin'] = ('leader_fin', 'first')
         
-        # Group by batch name and aggregate
-        table_df = filtered_df.groupby('name').agg(agg_dict).reset_index()
+        # Enrollment count comes out of the same groupby pass
+        agg_dict['Total Enrollments'] = ('Exam_2', 'size')
         
-        # Add enrollment count
-        enrollment_counts = filtered_df.groupby('name').size().reset_index(name='Total Enrollments')
-        table_df = table_df.merge(enrollment_counts, on='name', how='left')
+        # Group by batch name and aggregate (only batches present in the filtered data)
+        table_df = filtered_df.groupby('name', observed=True).agg(**agg_dict)
+        
+        # Primary/upgrade counts per batch from one crosstab, placed right after the revenue column
+        if 'order_type' in filtered_df.columns:
+            order_counts = pd.crosstab(filtered_df['name'], filtered_df['order_type']).reindex(
+                index=table_df.index, columns=['PRIMARY', 'UPGRADE'], fill_value=0)
+            order_types = (order_counts['PRIMARY'].astype(str) + ' Primary, ' +
+                           order_counts['UPGRADE'].astype(str) + ' Upgrade')
+            table_df.insert(table_df.columns.get_loc('net_amount' if 'net_amount' in table_df.columns else 'Exam_2') + 1,
+                            'order_type', order_types)
+        table_df = table_df.reset_index()
         
         # Reorder columns
         cols_order = ['name', 'Total Enrollments']
@@ -973,34 +1420,39 @@ def update_dashboard(start_date, end_date, batch_filter, exam_filter, plan_filte
         
         # Calculate totals for the footer row
         total_enrollments = table_df['Total Enrollments'].sum() if 'Total Enrollments' in table_df.columns else 0
-        total_revenue_sum = filtered_df['net_amount'].sum() / 10000000 if 'net_amount' in filtered_df.columns else 0
+        # Revenue covers every filtered row, which the memoized card summary already summed
+        if totals is not None:
+            total_revenue_sum = total_revenue_cr
+        else:
+            total_revenue_sum = filtered_df['net_amount'].sum() / 10000000 if 'net_amount' in filtered_df.columns else 0
         
-        # Create footer cells based on actual column order
-        footer_cells = []
-        for col in table_df.columns:
-            if col == 'Batch Name':
-                footer_cells.append(html.Td('TOTAL', style={'padding': '12px', 'fontWeight': 'bold', 'backgroundColor': '#E3F2FD', 'borderTop': '2px solid #1976D2'}))
-            elif col == 'Total Enrollments':
-                footer_cells.append(html.Td(f"{total_enrollments:,}", style={'padding': '12px', 'fontWeight': 'bold', 'backgroundColor': '#E3F2FD', 'borderTop': '2px solid #1976D2'}))
-            elif col == 'Total Revenue (₹ Cr)':
-                footer_cells.append(html.Td(f"₹{total_revenue_sum:.2f} Cr", style={'padding': '12px', 'fontWeight': 'bold', 'backgroundColor': '#E3F2FD', 'borderTop': '2px solid #1976D2'}))
-            else:
-                footer_cells.append(html.Td('', style={'padding': '12px', 'backgroundColor': '#E3F2FD', 'borderTop': '2px solid #1976D2'}))
+        # Total row appended to the table data, styled as a footer
+        total_row = {col: '' for col in table_df.columns}
+        if 'Batch Name' in total_row:
+            total_row['Batch Name'] = 'TOTAL'
+        if 'Total Enrollments' in total_row:
+            total_row['Total Enrollments'] = f"{total_enrollments:,}"
+        if 'Total Revenue (₹ Cr)' in total_row:
+            total_row['Total Revenue (₹ Cr)'] = f"₹{total_revenue_sum:.2f} Cr"
         
-        table = html.Table([
-            html.Thead(html.Tr([html.Th(col, style={'padding': '12px', 'backgroundColor': '#1976D2', 
-                                                      'color': 'white', 'fontWeight': 'bold', 'textAlign': 'left'}) 
-                                for col in table_df.columns])),
-            html.Tbody([
-                html.Tr([
-                    html.Td(str(table_df.iloc[i][col]), style={'padding': '10px', 'borderBottom': '1px solid #ddd', 'textAlign': 'left'}) 
-                    for col in table_df.columns
-                ], style={'backgroundColor': '#f9f9f9' if i % 2 == 0 else 'white'}) 
-                for i in range(len(table_df))
-            ]),
-            # Add Total row at the bottom with dynamic positioning
-            html.Tfoot(html.Tr(footer_cells))
-        ], style={'width': '100%', 'borderCollapse': 'collapse'})
+        # DataTable ships rows as plain records and renders them in the browser
+        table = dash_table.DataTable(
+            data=table_df.to_dict('records') + [total_row],
+            columns=[{'name': col, 'id': col} for col in table_df.columns],
+            # Every batch on one page, as the old html.Table showed them: keeps the TOTAL row visible
+            # and lets the screenshot capture the whole table
+            page_action='none',
+            style_table={'width': '100%', 'overflowX': 'auto'},
+            style_header={'padding': '12px', 'backgroundColor': '#1976D2', 'color': 'white',
+                          'fontWeight': 'bold', 'textAlign': 'left'},
+            style_cell={'padding': '10px', 'textAlign': 'left', 'fontFamily': 'Arial, sans-serif',
+                        'border': 'none', 'borderBottom': '1px solid #ddd'},
+            style_data_conditional=[
+                {'if': {'row_index': 'even'}, 'backgroundColor': '#f9f9f9'},
+                {'if': {'filter_query': '{Batch Name} = "TOTAL"'}, 'padding': '12px', 'fontWeight': 'bold',
+                 'backgroundColor': '#E3F2FD', 'borderTop': '2px solid #1976D2'},
+            ],
+        )
         
         data_table = html.Div([
             table,
@@ -1010,7 +1462,7 @@ def update_dashboard(start_date, end_date, batch_filter, exam_filter, plan_filte
     else:
         data_table = html.P("No data available")
     
-    return summary_cards, fig1, fig2, fig2_5, fig3, fig4, data_table, filtered_df.to_json(date_format='iso', orient='split')
+    return summary_cards, fig1, fig2, fig2_5, fig3, fig4, data_table
 
 # Export callbacks
 @callback(
@@ -1019,69 +1471,49 @@ def update_dashboard(start_date, end_date, batch_filter, exam_filter, plan_filte
     State('filtered-data-store', 'children'),
     prevent_initial_call=True
 )
-def export_overall(n_clicks, filtered_data_json):
-    if n_clicks > 0 and filtered_data_json:
-        filtered_df = pd.read_json(filtered_data_json, orient='split')
-        if 'name' in filtered_df.columns:
-            export_df = filtered_df['name'].value_counts().reset_index()
+def export_overall(n_clicks, filter_key):
+    if n_clicks > 0 and filter_key:
+        totals = get_export_totals(filter_key)
+        if totals is not None and 'by_name' in totals:
+            # Same per-batch totals as the chart, already sorted by enrollment
+            export_df = totals['by_name'].reset_index()
             export_df.columns = ['Batch Name', 'Enrollment Count']
-            return dcc.send_data_frame(export_df.to_excel, 
-                                      f"Overall_Enrollment_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", 
-                                      index=False, sheet_name='Overall Enrollment')
+            return send_excel(export_df, f"Overall_Enrollment_{export_timestamp()}.xlsx", 'Overall Enrollment')
     return None
 
 @callback(
     Output('download-last7', 'data'),
     Input('export-last7-btn', 'n_clicks'),
     State('filtered-data-store', 'children'),
-    State('date-filter', 'end_date'),
     prevent_initial_call=True
 )
-def export_last7(n_clicks, filtered_data_json, end_date):
-    if n_clicks > 0 and filtered_data_json:
-        filtered_df = pd.read_json(filtered_data_json, orient='split')
-        
-        # Ensure converteddate is datetime
-        if 'converteddate' in filtered_df.columns:
-            filtered_df['converteddate'] = pd.to_datetime(filtered_df['converteddate'])
-        
-        last_7_days_df = filtered_df[filtered_df['converteddate'] >= (pd.Timestamp(end_date) - pd.Timedelta(days=7))] if 'converteddate' in filtered_df.columns else filtered_df
+def export_last7(n_clicks, filter_key):
+    if n_clicks > 0 and filter_key:
+        totals = get_export_totals(filter_key)
         
-        if 'converteddate' in last_7_days_df.columns and len(last_7_days_df) > 0:
-            # Group by date only (overall)
-            export_df = last_7_days_df.groupby('converteddate').size().reset_index(name='Total Enrollments')
-            export_df['converteddate'] = export_df['converteddate'].dt.strftime('%Y-%m-%d')
-            export_df.columns = ['Date', 'Total Enrollments']
-            return dcc.send_data_frame(export_df.to_excel, 
-                                      f"Last_7_Days_Enrollment_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", 
-                                      index=False, sheet_name='Last 7 Days')
+        if totals is not None and len(totals['last_7']) > 0:
+            # Daily totals (overall) for the window the chart shows
+            last_7 = totals['last_7']
+            export_df = pd.DataFrame({'Date': last_7['converteddate'].dt.strftime('%Y-%m-%d'),
+                                      'Total Enrollments': last_7['enrollments']})
+            return send_excel(export_df, f"Last_7_Days_Enrollment_{export_timestamp()}.xlsx", 'Last 7 Days')
     return None
 
 @callback(
     Output('download-revenue-trend', 'data'),
     Input('export-revenue-trend-btn', 'n_clicks'),
     State('filtered-data-store', 'children'),
-    State('date-filter', 'end_date'),
     prevent_initial_call=True
 )
-def export_revenue_trend(n_clicks, filtered_data_json, end_date):
-    if n_clicks > 0 and filtered_data_json:
-        filtered_df = pd.read_json(filtered_data_json, orient='split')
+def export_revenue_trend(n_clicks, filter_key):
+    if n_clicks > 0 and filter_key:
+        totals = get_export_totals(filter_key)
         
-        # Ensure converteddate is datetime
-        if 'converteddate' in filtered_df.columns:
-            filtered_df['converteddate'] = pd.to_datetime(filtered_df['converteddate'])
-        
-        last_7_days_df = filtered_df[filtered_df['converteddate'] >= (pd.Timestamp(end_date) - pd.Timedelta(days=7))] if 'converteddate' in filtered_df.columns else filtered_df
-        
-        if 'converteddate' in last_7_days_df.columns and 'net_amount' in last_7_days_df.columns and len(last_7_days_df) > 0:
-            export_df = last_7_days_df.groupby('converteddate')['net_amount'].sum().reset_index()
-            export_df['net_amount'] = export_df['net_amount'] / 10000000  # Convert to Crores
-            export_df['converteddate'] = export_df['converteddate'].dt.strftime('%Y-%m-%d')
-            export_df.columns = ['Date', 'Revenue (₹ Cr)']
-            return dcc.send_data_frame(export_df.to_excel, 
-                                      f"Revenue_Trend_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", 
-                                      index=False, sheet_name='Revenue Trend')
+        if totals is not None and 'net_amount' in totals['last_7'].columns and len(totals['last_7']) > 0:
+            last_7 = totals['last_7']
+            export_df = pd.DataFrame({'Date': last_7['converteddate'].dt.strftime('%Y-%m-%d'),
+                                      'Revenue (₹ Cr)': last_7['net_amount'] / 10000000})  # Convert to Crores
+            return send_excel(export_df, f"Revenue_Trend_{export_timestamp()}.xlsx", 'Revenue Trend')
     return None
 
 @callback(
@@ -1090,15 +1522,13 @@ def export_revenue_trend(n_clicks, filtered_data_json, end_date):
     State('filtered-data-store', 'children'),
     prevent_initial_call=True
 )
-def export_exam_dist(n_clicks, filtered_data_json):
-    if n_clicks > 0 and filtered_data_json:
-        filtered_df = pd.read_json(filtered_data_json, orient='split')
-        if 'Exam_2' in filtered_df.columns:
-            export_df = filtered_df['Exam_2'].value_counts().reset_index()
+def export_exam_dist(n_clicks, filter_key):
+    if n_clicks > 0 and filter_key:
+        totals = get_export_totals(filter_key)
+        if totals is not None and 'by_exam' in totals:
+            export_df = totals['by_exam']['enrollments'].reset_index()
             export_df.columns = ['Exam Category', 'Enrollment Count']
-            return dcc.send_data_frame(export_df.to_excel, 
-                                      f"Exam_Distribution_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", 
-                                      index=False, sheet_name='Exam Distribution')
+            return send_excel(export_df, f"Exam_Distribution_{export_timestamp()}.xlsx", 'Exam Distribution')
     return None
 
 @callback(
@@ -1107,133 +1537,75 @@ def export_exam_dist(n_clicks, filtered_data_json):
     State('filtered-data-store', 'children'),
     prevent_initial_call=True
 )
-def export_revenue_exam(n_clicks, filtered_data_json):
-    if n_clicks > 0 and filtered_data_json:
-        filtered_df = pd.read_json(filtered_data_json, orient='split')
-        if 'Exam_2' in filtered_df.columns and 'net_amount' in filtered_df.columns and len(filtered_df) > 0:
-            export_df = filtered_df.groupby('Exam_2')['net_amount'].sum().reset_index()
+def export_revenue_exam(n_clicks, filter_key):
+    if n_clicks > 0 and filter_key:
+        totals = get_export_totals(filter_key)
+        if totals is not None and 'by_exam' in totals and 'net_amount' in totals['by_exam'].columns and len(totals['by_exam']) > 0:
+            export_df = totals['by_exam']['net_amount'].reset_index()
             export_df['net_amount'] = export_df['net_amount'] / 10000000  # Convert to Crores
             export_df.columns = ['Exam Category', 'Revenue (₹ Cr)']
             export_df = export_df.sort_values('Revenue (₹ Cr)', ascending=False)
-            return dcc.send_data_frame(export_df.to_excel, 
-                                      f"Revenue_by_Exam_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", 
-                                      index=False, sheet_name='Revenue by Exam')
+            return send_excel(export_df, f"Revenue_by_Exam_{export_timestamp()}.xlsx", 'Revenue by Exam')
     return None
 
 @callback(
     Output('download-table', 'data'),
     Input('export-table-btn', 'n_clicks'),
     State('filtered-data-store', 'children'),
+    State('export-format', 'value'),
     prevent_initial_call=True
 )
-def export_table(n_clicks, filtered_data_json):
-    if n_clicks > 0 and filtered_data_json:
-        filtered_df = pd.read_json(filtered_data_json, orient='split')
-        
-        if 'name' in filtered_df.columns:
-            # Aggregate data by batch
-            agg_dict = {}
-            
-            if 'Exam_2' in filtered_df.columns:
-                agg_dict['Exam_2'] = 'first'
-            
-            if 'net_amount' in filtered_df.columns:
-                agg_dict['net_amount'] = 'sum'
-            
-            if 'leader_fin' in filtered_df.columns:
-                agg_dict['leader_fin'] = 'first'
-            
-            # Group by batch name
-            export_df = filtered_df.groupby('name').agg(agg_dict).reset_index()
-            
-            # Add enrollment count
-            enrollment_counts = filtered_df.groupby('name').size().reset_index(name='Total Enrollments')
-            export_df = export_df.merge(enrollment_counts, on='name', how='left')
-            
-            # Add order type counts
-            if 'order_type' in filtered_df.columns:
-                order_primary = filtered_df[filtered_df['order_type'] == 'PRIMARY'].groupby('name').size().reset_index(name='Primary Orders')
-                order_upgrade = filtered_df[filtered_df['order_type'] == 'UPGRADE'].groupby('name').size().reset_index(name='Upgrade Orders')
-                export_df = export_df.merge(order_primary, on='name', how='left')
-                export_df = export_df.merge(order_upgrade, on='name', how='left')
-                export_df['Primary Orders'] = export_df['Primary Orders'].fillna(0).astype(int)
-                export_df['Upgrade Orders'] = export_df['Upgrade Orders'].fillna(0).astype(int)
-            
-            # Rename columns
-            export_df = export_df.rename(columns={
-                'name': 'Batch Name',
-                'Exam_2': 'Exam Category',
-                'net_amount': 'Total Revenue (₹ Cr)',
-                'leader_fin': 'Leader'
-            })
-            
-            # Convert revenue to Crores
-            if 'Total Revenue (₹ Cr)' in export_df.columns:
-                export_df['Total Revenue (₹ Cr)'] = export_df['Total Revenue (₹ Cr)'] / 10000000
-            
-            # Reorder columns
-            cols_order = ['Batch Name', 'Total Enrollments', 'Exam Category', 'Total Revenue (₹ Cr)', 
-                         'Primary Orders', 'Upgrade Orders', 'Leader']
-            final_cols = [col for col in cols_order if col in export_df.columns]
-            export_df = export_df[final_cols]
-            
-            # Sort by Total Enrollments
-            export_df = export_df.sort_values('Total Enrollments', ascending=False)
-            
-            # Add total row at the bottom
-            total_row = {}
-            for col in export_df.columns:
-                if col == 'Batch Name':
-                    total_row[col] = 'TOTAL'
-                elif col == 'Total Enrollments':
-                    total_row[col] = export_df['Total Enrollments'].sum()
-                elif col == 'Total Revenue (₹ Cr)':
-                    total_row[col] = export_df['Total Revenue (₹ Cr)'].sum()
-                elif col == 'Primary Orders':
-                    total_row[col] = export_df['Primary Orders'].sum() if 'Primary Orders' in export_df.columns else ''
-                elif col == 'Upgrade Orders':
-                    total_row[col] = export_df['Upgrade Orders'].sum() if 'Upgrade Orders' in export_df.columns else ''
-                else:
-                    total_row[col] = ''
-            
-            # Append total row to dataframe
-            export_df = pd.concat([export_df, pd.DataFrame([total_row])], ignore_index=True)
-            
-            return dcc.send_data_frame(export_df.to_excel, 
-                                      f"Batch_Summary_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", 
-                                      index=False, sheet_name='Batch Summary')
+def export_table(n_clicks, filter_key, export_format):
+    if n_clicks > 0 and filter_key:
+        # CSV unless Excel is picked: to_csv is far cheaper than writing an xlsx workbook
+        file_format = 'xlsx' if export_format == 'xlsx' else 'csv'
+        data = get_batch_file(filter_key, file_format)
+        if data is not None:
+            return dcc.send_bytes(data, f"Batch_Summary_{export_timestamp()}.{file_format}")
         else:
-            return dcc.send_data_frame(filtered_df.to_excel, 
-                                      f"Full_Data_{datetime.now().strftime('%Y%m%d_%H%M%S')}.xlsx", 
-                                      index=False, sheet_name='Data')
+            data = export_bytes(get_filtered_data(filter_key), file_format, 'Data')
+            return dcc.send_bytes(data, f"Full_Data_{export_timestamp()}.{file_format}")
     return None
 
 # Screenshot callback using clientside callback
+# The rendered table is rasterized once per filter key and reused until the table changes
 app.clientside_callback(
     """
-    function(n_clicks) {
+    function(n_clicks, tableKey) {
         if (n_clicks > 0) {
             const element = document.getElementById('table-container');
             if (element) {
-                // Use html2canvas library to capture screenshot
-                if (typeof html2canvas !== 'undefined') {
+                const download = function(canvas) {
+                    // Encode as JPEG (much cheaper than PNG's deflate) off the main thread, then download
+                    canvas.toBlob(function(blob) {
+                        const url = window.URL.createObjectURL(blob);
+                        const a = document.createElement('a');
+                        a.href = url;
+                        const timestamp = new Date().toISOString().slice(0,19).replace(/:/g,'-');
+                        a.download = 'Table_Screenshot_' + timestamp + '.jpg';
+                        document.body.appendChild(a);
+                        a.click();
+                        document.body.removeChild(a);
+                        window.URL.revokeObjectURL(url);
+                    }, 'image/jpeg', 0.9);
+                };
+                const cached = window.__tableSnapshot;
+                if (cached && cached.key === tableKey) {
+                    download(cached.canvas);
+                } else if (typeof html2canvas !== 'undefined') {
+                    // Use html2canvas library to capture screenshot, on whole-pixel bounds at an integer scale
+                    const bounds = element.getBoundingClientRect();
                     html2canvas(element, {
                         backgroundColor: '#ffffff',
                         scale: 2,
-                        logging: false
+                        width: Math.floor(bounds.width),
+                        height: Math.floor(bounds.height),
+                        logging: false,
+                        imageTimeout: 0,
+                        removeContainer: true
                     }).then(canvas => {
-                        // Convert canvas to blob and download
-                        canvas.toBlob(function(blob) {
-                            const url = window.URL.createObjectURL(blob);
-                            const a = document.createElement('a');
-                            a.href = url;
-                            const timestamp = new Date().toISOString().slice(0,19).replace(/:/g,'-');
-                            a.download = 'Table_Screenshot_' + timestamp + '.png';
-                            document.body.appendChild(a);
-                            a.click();
-                            document.body.removeChild(a);
-                            window.URL.revokeObjectURL(url);
-                        });
+                        window.__tableSnapshot = {key: tableKey, canvas: canvas};
+                        download(canvas);
                     });
                 } else {
                     alert('Screenshot feature requires html2canvas library. Please install it to use this feature.');
@@ -1245,6 +1617,7 @@ app.clientside_callback(
     """,
     Output('screenshot-table-btn', 'n_clicks'),
     Input('screenshot-table-btn', 'n_clicks'),
+    State('filtered-data-store', 'children'),
     prevent_initial_call=True
 )
 
@@ -1253,4 +1626,6 @@ app.clientside_callback(
 # ========================================================================================================
 
 if __name__ == '__main__':
-    app.run(debug=True, host='0.0.0.0', port=8050)
+    # Development server only; production runs `gunicorn -c gunicorn_conf.py dashboard_app:server`.
+    # The reloader and debugger stay off unless DASH_DEBUG=1
+    app.run(debug=DEBUG, host='0.0.0.0', port=8050)
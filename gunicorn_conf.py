@@ -0,0 +1,15 @@
+# Gunicorn settings for serving dashboard_app:server
+# Usage: gunicorn -c gunicorn_conf.py dashboard_app:server
+import os
+
+bind = f"0.0.0.0:{os.getenv('PORT', '8050')}"
+
+# Each worker process holds its own copy of the data cache, cube and memos, so one worker by default;
+# raise WEB_CONCURRENCY only on instances with RAM to spare. Threads let one worker serve other
+# callbacks while one waits on Sheets
+workers = int(os.getenv('WEB_CONCURRENCY', '1'))
+worker_class = 'gthread'
+threads = int(os.getenv('GUNICORN_THREADS', '4'))
+
+# First request in a worker may fetch all worksheets from Google Sheets
+timeout = 120